@@ -1,12 +1,14 @@
 import os
 import shutil
 import sqlite3
+import uuid
 import logging
 from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Body
 from fastapi.responses import StreamingResponse
 from typing import Optional
-from receipt.utils.ocr import extract_text_easyocr, parse_receipt_text
-from receipt.database.models import init_db
+from receipt.utils.ocr import extract_text, parse_receipt_text
+from receipt.utils.job_queue import get_job_queue
+from receipt.database.models import init_db, save_receipt
 import statistics
 import csv
 import io
@@ -15,10 +17,22 @@ logging.basicConfig(level=logging.INFO)
 app = FastAPI()
 UPLOAD_DIR = 'receipt/uploads'
 os.makedirs(UPLOAD_DIR, exist_ok=True)
+# 'inline' runs OCR in the request; 'queue' hands it to receipt.backend.worker processes
+OCR_MODE = os.environ.get('RECEIPT_OCR_MODE', 'inline')
+# Fail loudly on a typo: falling back to inline mode would wipe the shared database
+if OCR_MODE not in ('inline', 'queue'):
+    raise ValueError(f"RECEIPT_OCR_MODE must be 'inline' or 'queue', got {OCR_MODE!r}")
+job_queue = None
 
 @app.on_event('startup')
 def startup_event():
-    init_db()
+    global job_queue
+    if OCR_MODE == 'queue':
+        # Several API processes share the database, so never wipe it here
+        init_db(reset=False)
+        job_queue = get_job_queue()
+    else:
+        init_db()
 
 @app.post('/upload/')
 async def upload_receipt(
@@ -29,31 +43,35 @@ async def upload_receipt(
         ext = os.path.splitext(file.filename)[1].lower()
         if ext not in ['.jpg', '.jpeg', '.png', '.pdf', '.txt']:
             raise HTTPException(status_code=400, detail='Unsupported file type')
-        save_path = f'{UPLOAD_DIR}/{file.filename}'
+        if OCR_MODE == 'queue':
+            # Unique name so concurrent uploads of the same file don't clobber each other
+            save_path = f'{UPLOAD_DIR}/{uuid.uuid4().hex}{ext}'
+        else:
+            save_path = f'{UPLOAD_DIR}/{file.filename}'
         with open(save_path, 'wb') as buffer:
             shutil.copyfileobj(file.file, buffer)
-        if ext == '.txt':
-            with open(save_path, 'r', encoding='utf-8') as f:
-                text = f.read()
-        else:
-            text = extract_text_easyocr(save_path, lang=lang)
+        if OCR_MODE == 'queue':
+            job_id = job_queue.enqueue(save_path, file.filename, lang=lang)
+            return {'filename': file.filename, 'job_id': job_id, 'status': 'queued'}
+        text = extract_text(save_path, lang=lang)
         parsed = parse_receipt_text(text)
         parsed['filename'] = file.filename
-        conn = sqlite3.connect('receipt/receipts_final.db')
-        c = conn.cursor()
-        try:
-            c.execute('ALTER TABLE receipts ADD COLUMN currency TEXT')
-        except Exception:
-            pass
-        c.execute('INSERT OR IGNORE INTO receipts (vendor, date, amount, category, filename, currency) VALUES (?, ?, ?, ?, ?, ?)',
-                  (parsed['vendor'], parsed['date'], parsed['amount'], parsed['category'], parsed['filename'], parsed['currency']))
-        conn.commit()
-        conn.close()
+        save_receipt(parsed)
         return {'filename': file.filename, 'parsed': parsed}
     except Exception as e:
         logging.exception('Error in upload_receipt')
         raise HTTPException(status_code=500, detail=f'Internal server error: {str(e)}')
 
+@app.get('/jobs/{job_id}/')
+def get_job(job_id: str):
+    if job_queue is None:
+        raise HTTPException(status_code=404, detail='Job queue is not enabled')
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail='Job not found')
+    return {'id': job['id'], 'filename': job['filename'], 'status': job['status'],
+            'attempts': job['attempts'], 'parsed': job['result'], 'error': job['error']}
+
 @app.get('/receipts/')
 def list_receipts(
     search: Optional[str] = None,
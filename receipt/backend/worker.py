@@ -0,0 +1,105 @@
+import os
+import time
+import logging
+import argparse
+import multiprocessing
+
+logging.basicConfig(level=logging.INFO)
+POLL_INTERVAL = 1.0
+RETRY_DELAY = 5.0
+# Retrying these would only rerun OCR to hit the same error
+PERMANENT_ERRORS = (ValueError,)
+
+
+def pin_cpu_budget(threads, cpus=None):
+    # Must run before torch/easyocr are imported so the thread pools pick it up
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(threads)
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    import torch
+    torch.set_num_threads(threads)
+
+
+def process_job(job):
+    from receipt.utils.ocr import extract_text, parse_receipt_text
+    from receipt.database.models import save_receipt
+    text = extract_text(job['file_path'], lang=job['lang'])
+    parsed = parse_receipt_text(text)
+    parsed['filename'] = job['filename']
+    save_receipt(parsed)
+    return parsed
+
+
+def handle_job(queue, job):
+    try:
+        parsed = process_job(job)
+    except PERMANENT_ERRORS as e:
+        logging.exception('OCR job %s failed permanently', job['id'])
+        return queue.fail(job['id'], job['lease'], str(e), permanent=True)
+    except Exception as e:
+        logging.exception('OCR job %s failed (attempt %d/%d)', job['id'], job['attempts'], job['max_attempts'])
+        return queue.fail(job['id'], job['lease'], str(e), retry_delay=RETRY_DELAY)
+    return queue.complete(job['id'], job['lease'], parsed)
+
+
+def run_worker(threads=1, cpus=None, queue_url=None, max_jobs=None):
+    pin_cpu_budget(threads, cpus)
+    from receipt.utils.job_queue import get_job_queue
+    from receipt.database.models import init_db
+    init_db(reset=False)
+    queue = get_job_queue(queue_url)
+    done = 0
+    logging.info('OCR worker %d started (threads=%d, cpus=%s)', os.getpid(), threads, sorted(cpus) if cpus else 'any')
+    while max_jobs is None or done < max_jobs:
+        try:
+            job = queue.claim()
+        except Exception:
+            # A locked database or dropped Redis connection shouldn't kill the worker
+            logging.exception('Could not claim a job, retrying in %.0fs', RETRY_DELAY)
+            time.sleep(RETRY_DELAY)
+            continue
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+        done += 1
+        try:
+            settled = handle_job(queue, job)
+        except Exception:
+            # The job stays claimed and is redelivered once its visibility timeout passes
+            logging.exception('Could not record the outcome of OCR job %s, retrying in %.0fs', job['id'], RETRY_DELAY)
+            time.sleep(RETRY_DELAY)
+            continue
+        if not settled:
+            logging.warning('Lease on OCR job %s expired before it finished; its job status was left to the newer claim '
+                            '(any receipt it parsed has already been saved)', job['id'])
+
+
+def run_pool(processes, threads=1, queue_url=None):
+    # Give each worker its own slice of cores so they don't contend
+    available = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else []
+    workers = []
+    ctx = multiprocessing.get_context('spawn')
+    for i in range(processes):
+        cpus = set(available[i * threads:(i + 1) * threads]) or None
+        p = ctx.Process(target=run_worker, args=(threads, cpus, queue_url))
+        p.start()
+        workers.append(p)
+    for p in workers:
+        p.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run OCR workers that pull receipts from the job queue.')
+    parser.add_argument('--processes', type=int, default=1, help='Number of worker processes')
+    parser.add_argument('--threads', type=int, default=1, help='Torch threads per worker')
+    parser.add_argument('--queue-url', default=None, help='SQLite path or redis:// URL (default: RECEIPT_QUEUE_URL)')
+    args = parser.parse_args()
+    if args.processes == 1:
+        run_worker(args.threads, queue_url=args.queue_url)
+    else:
+        run_pool(args.processes, args.threads, args.queue_url)
+
+
+if __name__ == '__main__':
+    main()
@@ -26,17 +26,37 @@ CREATE TABLE IF NOT EXISTS receipts (
 CREATE_VENDOR_INDEX = 'CREATE INDEX IF NOT EXISTS idx_vendor ON receipts(vendor);'
 CREATE_DATE_INDEX = 'CREATE INDEX IF NOT EXISTS idx_date ON receipts(date);'
 
-def init_db():
-    conn = sqlite3.connect('receipt/receipts_final.db')
+RECEIPTS_DB = 'receipt/receipts_final.db'
+
+def init_db(reset=True):
+    conn = sqlite3.connect(RECEIPTS_DB)
     c = conn.cursor()
-    # Drop the table if it exists (removes all data)
-    c.execute('DROP TABLE IF EXISTS receipts;')
+    # WAL lets several API/worker processes read while one writes
+    c.execute('PRAGMA journal_mode=WAL;')
+    if reset:
+        # Drop the table if it exists (removes all data)
+        c.execute('DROP TABLE IF EXISTS receipts;')
     c.execute(CREATE_RECEIPT_TABLE)
     c.execute(CREATE_VENDOR_INDEX)
     c.execute(CREATE_DATE_INDEX)
     conn.commit()
     conn.close()
 
+def save_receipt(parsed):
+    # The busy timeout waits out other processes' writes instead of failing on "database is locked"
+    conn = sqlite3.connect(RECEIPTS_DB, timeout=30)
+    c = conn.cursor()
+    try:
+        c.execute('ALTER TABLE receipts ADD COLUMN currency TEXT')
+    except Exception:
+        pass
+    try:
+        c.execute('INSERT OR IGNORE INTO receipts (vendor, date, amount, category, filename, currency) VALUES (?, ?, ?, ?, ?, ?)',
+                  (parsed['vendor'], parsed['date'], parsed['amount'], parsed['category'], parsed['filename'], parsed['currency']))
+        conn.commit()
+    finally:
+        conn.close()
+
 class Vendor(Base):
     __tablename__ = "vendors"
     id = Column(Integer, primary_key=True, index=True)
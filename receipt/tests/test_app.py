@@ -1,8 +1,14 @@
 import os
+import sqlite3
 import tempfile
 import pytest
 from fastapi.testclient import TestClient
 from receipt.backend.app import app
+from receipt.backend import app as app_module
+from receipt.backend import worker
+from receipt.database import models
+from receipt.utils import job_queue
+from receipt.utils.job_queue import SQLiteJobQueue
 
 client = TestClient(app)
 
@@ -31,4 +37,125 @@ def test_aggregate():
     assert "total" in agg
     assert "mean" in agg
     assert "median" in agg
-    assert "mode" in agg 
\ No newline at end of file
+    assert "mode" in agg 
+
+@pytest.fixture
+def receipts_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(models, 'RECEIPTS_DB', str(tmp_path / 'receipts.db'))
+    models.init_db()
+    return models.RECEIPTS_DB
+
+@pytest.fixture
+def queue_mode(tmp_path, monkeypatch):
+    queue = SQLiteJobQueue(str(tmp_path / 'jobs.db'))
+    monkeypatch.setattr(app_module, 'OCR_MODE', 'queue')
+    monkeypatch.setattr(app_module, 'job_queue', queue)
+    monkeypatch.setattr(app_module, 'UPLOAD_DIR', str(tmp_path))
+    return queue
+
+def count_receipts(db_path):
+    conn = sqlite3.connect(db_path)
+    count = conn.execute('SELECT COUNT(*) FROM receipts').fetchone()[0]
+    conn.close()
+    return count
+
+def test_upload_queue_mode_returns_job_id(queue_mode):
+    response = client.post("/upload/", files={"file": ("amazon.txt", b"Amazon\n2024-01-01\n123.45\n", "text/plain")})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "queued"
+    job = queue_mode.get(data["job_id"])
+    assert job["filename"] == "amazon.txt"
+    assert os.path.exists(job["file_path"])
+
+def test_get_job_done(queue_mode):
+    job_id = queue_mode.enqueue('amazon.txt', 'amazon.txt')
+    job = queue_mode.claim()
+    queue_mode.complete(job_id, job["lease"], {"vendor": "Amazon", "amount": 123.45})
+    response = client.get(f"/jobs/{job_id}/")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "done"
+    assert data["parsed"]["vendor"] == "Amazon"
+
+def test_get_job_missing(queue_mode):
+    response = client.get("/jobs/does-not-exist/")
+    assert response.status_code == 404
+
+def test_get_job_queue_disabled(monkeypatch):
+    monkeypatch.setattr(app_module, 'job_queue', None)
+    response = client.get("/jobs/anything/")
+    assert response.status_code == 404
+
+def test_save_receipt(receipts_db):
+    parsed = {'vendor': 'Amazon', 'date': '2024-01-01', 'amount': 123.45, 'category': 'Shopping', 'filename': 'a.txt', 'currency': 'USD'}
+    models.save_receipt(parsed)
+    models.save_receipt(parsed)
+    assert count_receipts(receipts_db) == 1
+
+def test_init_db_reset_false_keeps_rows(receipts_db):
+    models.save_receipt({'vendor': 'Amazon', 'date': '2024-01-01', 'amount': 123.45, 'category': 'Shopping', 'filename': 'a.txt', 'currency': 'USD'})
+    models.init_db(reset=False)
+    assert count_receipts(receipts_db) == 1
+    models.init_db()
+    assert count_receipts(receipts_db) == 0
+
+def test_worker_process_job_txt(receipts_db, tmp_path):
+    path = tmp_path / 'amazon.txt'
+    path.write_text("Amazon\n2024-01-01\n$123.45\n", encoding='utf-8')
+    parsed = worker.process_job({'file_path': str(path), 'filename': 'amazon.txt', 'lang': 'en'})
+    assert parsed["vendor"] == "Amazon"
+    assert parsed["amount"] == 123.45
+    assert parsed["filename"] == "amazon.txt"
+    assert count_receipts(receipts_db) == 1
+
+@pytest.fixture
+def worker_queue(tmp_path, monkeypatch, receipts_db):
+    monkeypatch.setattr(worker, 'pin_cpu_budget', lambda threads, cpus=None: None)
+    monkeypatch.setattr(worker, 'RETRY_DELAY', 0)
+    monkeypatch.setattr(worker.time, 'sleep', lambda seconds: None)
+    queue = SQLiteJobQueue(str(tmp_path / 'jobs.db'), visibility_timeout=0)
+    monkeypatch.setattr(job_queue, 'get_job_queue', lambda url=None: queue)
+    return queue
+
+def fail_first_call(monkeypatch, cls, name):
+    original = getattr(cls, name)
+    calls = []
+    def wrapper(self, *args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError('database is locked')
+        return original(self, *args, **kwargs)
+    monkeypatch.setattr(cls, name, wrapper)
+
+def test_run_worker_settles_jobs(worker_queue, monkeypatch):
+    seen = []
+    def fake_process_job(job):
+        seen.append(job['filename'])
+        if job['filename'] == 'bad.gif':
+            raise ValueError('Unsupported file type for OCR')
+        if job['filename'] == 'flaky.png' and seen.count('flaky.png') == 1:
+            raise RuntimeError('OCR crashed')
+        return {'vendor': 'Amazon', 'filename': job['filename']}
+    monkeypatch.setattr(worker, 'process_job', fake_process_job)
+    fail_first_call(monkeypatch, SQLiteJobQueue, 'claim')
+    ok = worker_queue.enqueue('ok.png', 'ok.png')
+    bad = worker_queue.enqueue('bad.gif', 'bad.gif')
+    flaky = worker_queue.enqueue('flaky.png', 'flaky.png')
+    worker.run_worker(max_jobs=4)
+    assert worker_queue.get(ok)['status'] == 'done'
+    bad_job = worker_queue.get(bad)
+    assert bad_job['status'] == 'failed'
+    assert bad_job['attempts'] == 1
+    flaky_job = worker_queue.get(flaky)
+    assert flaky_job['status'] == 'done'
+    assert flaky_job['attempts'] == 2
+
+def test_run_worker_survives_settle_error(worker_queue, monkeypatch):
+    monkeypatch.setattr(worker, 'process_job', lambda job: {'vendor': 'Amazon'})
+    fail_first_call(monkeypatch, SQLiteJobQueue, 'complete')
+    job_id = worker_queue.enqueue('ok.png', 'ok.png')
+    worker.run_worker(max_jobs=2)
+    job = worker_queue.get(job_id)
+    assert job['status'] == 'done'
+    assert job['attempts'] == 2
\ No newline at end of file
@@ -0,0 +1,76 @@
+import time
+import pytest
+from receipt.utils.job_queue import SQLiteJobQueue, RedisJobQueue
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def make_queue(request, tmp_path, monkeypatch):
+    if request.param == 'sqlite':
+        return lambda **kwargs: SQLiteJobQueue(str(tmp_path / 'jobs.db'), **kwargs)
+    fakeredis = pytest.importorskip('fakeredis')
+    pytest.importorskip('lupa')
+    import redis
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis.Redis, 'from_url', lambda url, **kwargs: fakeredis.FakeRedis(server=server, **kwargs))
+    return lambda **kwargs: RedisJobQueue('redis://localhost:6379/0', **kwargs)
+
+def test_enqueue_claim_complete(make_queue):
+    queue = make_queue()
+    job_id = queue.enqueue('receipt/uploads/a.png', 'a.png', lang='en')
+    job = queue.claim()
+    assert job['id'] == job_id
+    assert job['status'] == 'running'
+    assert job['attempts'] == 1
+    assert queue.claim() is None
+    queue.complete(job_id, job['lease'], {'vendor': 'Amazon', 'amount': 123.45})
+    job = queue.get(job_id)
+    assert job['status'] == 'done'
+    assert job['result']['vendor'] == 'Amazon'
+
+def test_fail_retries_until_max_attempts(make_queue):
+    queue = make_queue(max_attempts=2)
+    job_id = queue.enqueue('receipt/uploads/a.png', 'a.png')
+    job = queue.claim()
+    queue.fail(job['id'], job['lease'], 'boom')
+    assert queue.get(job_id)['status'] == 'queued'
+    job = queue.claim()
+    queue.fail(job['id'], job['lease'], 'boom again')
+    job = queue.get(job_id)
+    assert job['status'] == 'failed'
+    assert job['error'] == 'boom again'
+    assert queue.claim() is None
+
+def test_visibility_timeout_reclaims_job(make_queue):
+    queue = make_queue(visibility_timeout=0.05, max_attempts=2)
+    job_id = queue.enqueue('receipt/uploads/a.png', 'a.png')
+    assert queue.claim()['id'] == job_id
+    time.sleep(0.1)
+    job = queue.claim()
+    assert job['id'] == job_id
+    assert job['attempts'] == 2
+    time.sleep(0.1)
+    assert queue.claim() is None
+    assert queue.get(job_id)['status'] == 'failed'
+
+def test_permanent_failure_skips_retries(make_queue):
+    queue = make_queue(max_attempts=3)
+    job_id = queue.enqueue('receipt/uploads/a.gif', 'a.gif')
+    job = queue.claim()
+    assert queue.fail(job['id'], job['lease'], 'Unsupported file type for OCR', permanent=True)
+    assert queue.get(job_id)['status'] == 'failed'
+    assert queue.claim() is None
+
+def test_stale_lease_cannot_overwrite_job(make_queue):
+    queue = make_queue(visibility_timeout=0.05)
+    job_id = queue.enqueue('receipt/uploads/a.png', 'a.png')
+    stale = queue.claim()
+    time.sleep(0.1)
+    current = queue.claim()
+    assert current['lease'] != stale['lease']
+    assert queue.complete(job_id, current['lease'], {'vendor': 'Amazon'})
+    assert not queue.fail(job_id, stale['lease'], 'too slow')
+    assert not queue.complete(job_id, stale['lease'], {'vendor': 'Stale'})
+    job = queue.get(job_id)
+    assert job['status'] == 'done'
+    assert job['error'] is None
+    assert job['result'] == {'vendor': 'Amazon'}
+    assert queue.claim() is None
@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+
+QUEUE_URL = os.environ.get('RECEIPT_QUEUE_URL', 'receipt/jobs.db')
+VISIBILITY_TIMEOUT = float(os.environ.get('RECEIPT_VISIBILITY_TIMEOUT', '300'))
+MAX_ATTEMPTS = int(os.environ.get('RECEIPT_MAX_ATTEMPTS', '3'))
+
+# Job table schema for the SQLite-backed queue
+CREATE_JOB_TABLE = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    file_path TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    lease TEXT,
+    result TEXT,
+    error TEXT
+);
+'''
+CREATE_JOB_INDEX = 'CREATE INDEX IF NOT EXISTS idx_jobs_available ON jobs(status, available_at);'
+
+JOB_FIELDS = ['id', 'file_path', 'filename', 'lang', 'status', 'attempts', 'max_attempts',
+              'available_at', 'created_at', 'updated_at', 'lease', 'result', 'error']
+
+
+class SQLiteJobQueue:
+    """Durable job queue stored in a SQLite file shared by API and worker processes.
+
+    A claimed job stays invisible to other workers for ``visibility_timeout``
+    seconds; if the worker dies before completing it, the job is handed out
+    again until ``max_attempts`` is reached. Each claim gets a new ``lease``
+    token, and ``complete``/``fail`` are ignored unless they present the
+    current one, so a worker that outlived its timeout can't clobber the job.
+    """
+
+    def __init__(self, path=QUEUE_URL, visibility_timeout=VISIBILITY_TIMEOUT, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        conn = self._connect()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(CREATE_JOB_TABLE)
+        conn.execute(CREATE_JOB_INDEX)
+        conn.close()
+
+    def _connect(self):
+        # Autocommit mode so claim() can take the write lock with BEGIN IMMEDIATE
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def enqueue(self, file_path, filename, lang='en'):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            'INSERT INTO jobs (id, file_path, filename, lang, status, attempts, max_attempts, available_at, created_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?)',
+            (job_id, file_path, filename, lang, 'queued', self.max_attempts, now, now, now))
+        conn.close()
+        return job_id
+
+    def claim(self):
+        now = time.time()
+        lease = uuid.uuid4().hex
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            # Running jobs past their deadline with no attempts left are dead
+            conn.execute("UPDATE jobs SET status = 'failed', lease = NULL, error = COALESCE(error, 'visibility timeout expired'), updated_at = ? "
+                         "WHERE status = 'running' AND available_at <= ? AND attempts >= max_attempts", (now, now))
+            row = conn.execute("SELECT id FROM jobs WHERE status IN ('queued', 'running') AND available_at <= ? "
+                               'ORDER BY available_at LIMIT 1', (now,)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            conn.execute("UPDATE jobs SET status = 'running', attempts = attempts + 1, lease = ?, available_at = ?, updated_at = ? WHERE id = ?",
+                         (lease, now + self.visibility_timeout, now, row[0]))
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return self.get(row[0])
+
+    def complete(self, job_id, lease, result):
+        conn = self._connect()
+        cur = conn.execute("UPDATE jobs SET status = 'done', lease = NULL, result = ?, error = NULL, updated_at = ? "
+                           "WHERE id = ? AND status = 'running' AND lease = ?",
+                           (json.dumps(result), time.time(), job_id, lease))
+        conn.close()
+        return cur.rowcount == 1
+
+    def fail(self, job_id, lease, error, retry_delay=0, permanent=False):
+        now = time.time()
+        conn = self._connect()
+        cur = conn.execute("UPDATE jobs SET status = CASE WHEN ? = 0 AND attempts < max_attempts THEN 'queued' ELSE 'failed' END, "
+                           "lease = NULL, available_at = ?, error = ?, updated_at = ? WHERE id = ? AND status = 'running' AND lease = ?",
+                           (int(permanent), now + retry_delay, error, now, job_id, lease))
+        conn.close()
+        return cur.rowcount == 1
+
+    def get(self, job_id):
+        conn = self._connect()
+        row = conn.execute(f'SELECT {", ".join(JOB_FIELDS)} FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        conn.close()
+        if row is None:
+            return None
+        job = dict(zip(JOB_FIELDS, row))
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+
+# Hide one visible job for the visibility timeout, or fail it if it has no attempts left.
+# KEYS: pending set, job hash. ARGV: job id, now, visible_until, lease
+_REDIS_CLAIM_SCRIPT = '''
+local score = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not score or tonumber(score) > tonumber(ARGV[2]) then return 0 end
+if tonumber(redis.call('HGET', KEYS[2], 'attempts')) >= tonumber(redis.call('HGET', KEYS[2], 'max_attempts')) then
+    redis.call('ZREM', KEYS[1], ARGV[1])
+    redis.call('HSET', KEYS[2], 'status', 'failed', 'updated_at', ARGV[2])
+    redis.call('HSETNX', KEYS[2], 'error', 'visibility timeout expired')
+    redis.call('HDEL', KEYS[2], 'lease')
+    return 0
+end
+redis.call('HINCRBY', KEYS[2], 'attempts', 1)
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+redis.call('HSET', KEYS[2], 'status', 'running', 'lease', ARGV[4], 'available_at', ARGV[3], 'updated_at', ARGV[2])
+return 1
+'''
+
+# KEYS: pending set, job hash. ARGV: job id, lease, result, now
+_REDIS_COMPLETE_SCRIPT = '''
+if redis.call('HGET', KEYS[2], 'status') ~= 'running' or redis.call('HGET', KEYS[2], 'lease') ~= ARGV[2] then return 0 end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HSET', KEYS[2], 'status', 'done', 'result', ARGV[3], 'updated_at', ARGV[4])
+redis.call('HDEL', KEYS[2], 'error', 'lease')
+return 1
+'''
+
+# KEYS: pending set, job hash. ARGV: job id, lease, error, now, available_at, permanent
+_REDIS_FAIL_SCRIPT = '''
+if redis.call('HGET', KEYS[2], 'status') ~= 'running' or redis.call('HGET', KEYS[2], 'lease') ~= ARGV[2] then return 0 end
+local status = 'failed'
+if ARGV[6] == '0' and tonumber(redis.call('HGET', KEYS[2], 'attempts')) < tonumber(redis.call('HGET', KEYS[2], 'max_attempts')) then
+    status = 'queued'
+    redis.call('ZADD', KEYS[1], ARGV[5], ARGV[1])
+else
+    redis.call('ZREM', KEYS[1], ARGV[1])
+end
+redis.call('HSET', KEYS[2], 'status', status, 'available_at', ARGV[5], 'error', ARGV[3], 'updated_at', ARGV[4])
+redis.call('HDEL', KEYS[2], 'lease')
+return 1
+'''
+
+
+class RedisJobQueue:
+    """Same interface as SQLiteJobQueue, backed by a Redis-compatible server.
+
+    Scripts only touch the keys they are passed, but a job's hash and the
+    pending set live under different hash slots, so Redis Cluster is not
+    supported.
+    """
+
+    def __init__(self, url, visibility_timeout=VISIBILITY_TIMEOUT, max_attempts=MAX_ATTEMPTS, prefix='receipt:'):
+        import redis
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.pending_key = prefix + 'pending'
+        self.job_prefix = prefix + 'job:'
+        self._claim = self.client.register_script(_REDIS_CLAIM_SCRIPT)
+        self._complete = self.client.register_script(_REDIS_COMPLETE_SCRIPT)
+        self._fail = self.client.register_script(_REDIS_FAIL_SCRIPT)
+
+    def enqueue(self, file_path, filename, lang='en'):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self.client.hset(self.job_prefix + job_id, mapping={
+            'id': job_id, 'file_path': file_path, 'filename': filename, 'lang': lang, 'status': 'queued',
+            'attempts': 0, 'max_attempts': self.max_attempts, 'available_at': now, 'created_at': now, 'updated_at': now,
+        })
+        self.client.zadd(self.pending_key, {job_id: now})
+        return job_id
+
+    def claim(self):
+        # Skip past jobs that another worker took or that ran out of attempts
+        while True:
+            now = time.time()
+            ids = self.client.zrangebyscore(self.pending_key, '-inf', now, start=0, num=1)
+            if not ids:
+                return None
+            lease = uuid.uuid4().hex
+            if self._claim(keys=[self.pending_key, self.job_prefix + ids[0]],
+                           args=[ids[0], now, now + self.visibility_timeout, lease]) == 1:
+                return self.get(ids[0])
+
+    def complete(self, job_id, lease, result):
+        return self._complete(keys=[self.pending_key, self.job_prefix + job_id],
+                              args=[job_id, lease, json.dumps(result), time.time()]) == 1
+
+    def fail(self, job_id, lease, error, retry_delay=0, permanent=False):
+        now = time.time()
+        return self._fail(keys=[self.pending_key, self.job_prefix + job_id],
+                          args=[job_id, lease, error, now, now + retry_delay, int(permanent)]) == 1
+
+    def get(self, job_id):
+        data = self.client.hgetall(self.job_prefix + job_id)
+        if not data:
+            return None
+        job = {field: data.get(field) for field in JOB_FIELDS}
+        for field in ('attempts', 'max_attempts'):
+            job[field] = int(job[field])
+        for field in ('available_at', 'created_at', 'updated_at'):
+            job[field] = float(job[field])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+
+def get_job_queue(url=None):
+    url = url or QUEUE_URL
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisJobQueue(url)
+    return SQLiteJobQueue(url)
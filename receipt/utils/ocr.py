@@ -29,6 +29,12 @@ def extract_text_easyocr(file_path, lang='en'):
     else:
         raise ValueError('Unsupported file type for OCR')
 
+def extract_text(file_path, lang='en'):
+    if os.path.splitext(file_path)[1].lower() == '.txt':
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    return extract_text_easyocr(file_path, lang=lang)
+
 # Example vendor-category mapping (expand as needed)
 VENDOR_CATEGORY_MAP = {
     'Amazon': 'Shopping',